@@ -0,0 +1,132 @@
+window.paperSearch = (() => {
+  let index = null;
+  let loading = null;
+  let results = null;
+
+  function load() {
+    if (loading) {
+      return loading;
+    }
+    loading = new Promise((resolve, reject) => {
+      window.paperSearch.loaded = (data) => {
+        index = data;
+        resolve(data);
+      };
+      // the index is a script next to the page, fetched on first use only
+      const script = document.createElement("script");
+      script.src = window.paperSearchIndexUrl;
+      script.onerror = reject;
+      document.head.appendChild(script);
+    });
+    return loading;
+  }
+
+  // all term ids starting with prefix, terms are sorted so binary search
+  function prefixRange(prefix) {
+    const terms = index.terms;
+    let low = 0;
+    let high = terms.length;
+    while (low < high) {
+      const middle = (low + high) >> 1;
+      if (terms[middle][0] < prefix) {
+        low = middle + 1;
+      } else {
+        high = middle;
+      }
+    }
+    const docs = new Set();
+    for (let i = low; i < terms.length && terms[i][0].startsWith(prefix); i++) {
+      terms[i][1].forEach((doc) => docs.add(doc));
+    }
+    return docs;
+  }
+
+  function search(query) {
+    const words = (query.toLowerCase().match(/[\p{L}\p{N}]+/gu) || []).filter(
+      (word) => word.length > 1,
+    );
+    if (words.length === 0) {
+      return [];
+    }
+    let matches = null;
+    for (const word of words) {
+      const docs = prefixRange(word);
+      matches = matches
+        ? new Set([...matches].filter((doc) => docs.has(doc)))
+        : docs;
+    }
+    return [...matches].sort((a, b) => a - b).map((doc) => index.docs[doc]);
+  }
+
+  function jump(anchor) {
+    const target = document.getElementById(anchor);
+    if (!target) {
+      // the section holding it may not be loaded yet
+      if (window.paperSplit) {
+        window.paperSplit.reveal(anchor).then((found) => found && jump(anchor));
+      }
+      return;
+    }
+    // open collapsed proofs containing the target, and the target itself
+    for (let el = target; el; el = el.parentElement) {
+      if (el.tagName === "DETAILS") {
+        el.open = true;
+      }
+    }
+    target.scrollIntoView({ behavior: "smooth", block: "center" });
+    target.classList.add("search-hit");
+    setTimeout(() => target.classList.remove("search-hit"), 1500);
+    results.style.display = "none";
+  }
+
+  function render(found) {
+    results.innerHTML = "";
+    found.slice(0, 20).forEach(([anchor, kind, title, snippet]) => {
+      const item = document.createElement("li");
+      const heading = document.createElement("b");
+      heading.textContent = title;
+      const text = document.createElement("span");
+      text.textContent = snippet;
+      item.className = `search-${kind}`;
+      item.append(heading, " ", text);
+      item.addEventListener("click", () => jump(anchor));
+      results.appendChild(item);
+    });
+    results.style.display = found.length ? "block" : "none";
+  }
+
+  document.addEventListener("DOMContentLoaded", () => {
+    const box = document.createElement("div");
+    box.className = "search-box";
+    const input = document.createElement("input");
+    input.type = "search";
+    input.placeholder = "Search theorems, definitions, proofs…";
+    results = document.createElement("ul");
+    results.className = "search-results";
+    box.append(input, results);
+    document.body.prepend(box);
+
+    input.addEventListener("focus", () => load());
+    input.addEventListener("input", () =>
+      load().then(() => render(search(input.value))),
+    );
+    input.addEventListener("keydown", (e) => {
+      if (e.key === "Enter") {
+        load().then(() => {
+          const found = search(input.value);
+          if (found.length) {
+            jump(found[0][0]);
+          }
+        });
+      }
+    });
+    document.addEventListener("keydown", (e) => {
+      if (e.key === "/" && document.activeElement !== input) {
+        e.preventDefault();
+        input.focus();
+      }
+    });
+  });
+
+  return { load, search, loaded: () => {} };
+})();
@@ -0,0 +1,103 @@
+window.paperSplit = (() => {
+  const loading = {};
+  const done = {};
+
+  function manifest() {
+    return window.paperSplitManifest;
+  }
+
+  function typeset(element) {
+    // before MathJax has started, its first typeset covers the fragment
+    if (window.MathJax && MathJax.startup && MathJax.startup.promise) {
+      return MathJax.startup.promise.then(() => MathJax.typesetPromise([element]));
+    }
+    return Promise.resolve();
+  }
+
+  function load(index) {
+    if (!loading[index]) {
+      loading[index] = new Promise((resolve, reject) => {
+        done[index] = resolve;
+        // fragments are scripts next to the page, fetched on first use only
+        const script = document.createElement("script");
+        script.src = `${manifest().url}/${index}.js`;
+        script.onerror = reject;
+        document.head.appendChild(script);
+      });
+    }
+    return loading[index];
+  }
+
+  function loaded(index, html) {
+    const section = document.getElementById(`fragment-${index}`);
+    section.insertAdjacentHTML("beforeend", html);
+    section.classList.add("fragment-loaded");
+    typeset(section)
+      .catch((err) => console.log("MathJax error in fragment:", err))
+      .then(() => done[index]());
+  }
+
+  function preview(id) {
+    return manifest().previews[id];
+  }
+
+  // resolves to the element with this id, loading its section if needed
+  function reveal(id) {
+    const target = document.getElementById(id);
+    const index = manifest().fragments[id];
+    if (target || index === undefined) {
+      return Promise.resolve(target);
+    }
+    return load(index).then(() => document.getElementById(id));
+  }
+
+  function show(id) {
+    return reveal(id).then((target) => {
+      if (target) {
+        target.scrollIntoView();
+      }
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", () => {
+    const observer = new IntersectionObserver(
+      (entries) => {
+        entries.forEach((entry) => {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            load(Number(entry.target.dataset.fragment));
+          }
+        });
+      },
+      { rootMargin: "100% 0px" },
+    );
+    document
+      .querySelectorAll("section.fragment")
+      .forEach((section) => observer.observe(section));
+
+    // links to labels in sections that are not loaded yet
+    document.addEventListener("click", (e) => {
+      const link = e.target.closest('a[href^="#"]');
+      if (!link) {
+        return;
+      }
+      const id = decodeURIComponent(link.getAttribute("href").substring(1));
+      if (!document.getElementById(id) && id in manifest().fragments) {
+        e.preventDefault();
+        history.pushState(null, "", `#${id}`);
+        show(id);
+      }
+    });
+
+    const hash = decodeURIComponent(location.hash.substring(1));
+    if (hash) {
+      show(hash);
+    }
+  });
+
+  window.addEventListener("popstate", () => {
+    show(decodeURIComponent(location.hash.substring(1)));
+  });
+
+  return { load, loaded, preview, reveal };
+})();
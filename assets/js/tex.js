@@ -3,34 +3,52 @@ window.onload = () => {
   popup.className = "popup";
   document.body.appendChild(popup);
 
-  // Add interactivity to all anchor tags
-  document.querySelectorAll("a").forEach((link) => {
-    link.addEventListener("mouseenter", function () {
-      const href = this.getAttribute("href");
-
-      if (href && href.startsWith("#")) {
-        const targetId = href.substring(1);
-        const targetEl = document.getElementById(targetId);
-
-        if (targetEl) {
-          popup.innerHTML = targetEl.innerHTML;
-          showPopup(this);
-
-          // Optional: process MathJax
-          if (window.MathJax && window.MathJax.typesetPromise) {
-            MathJax.typesetPromise([popup]).catch((err) => {
-              console.log("MathJax error in popup:", err);
-            });
-          }
-        }
+  // Delegated, so links in sections loaded later get previews too
+  document.addEventListener("mouseover", (e) => {
+    const link = e.target.closest("a");
+    if (!link || popup.contains(link) || link.contains(e.relatedTarget)) {
+      return;
+    }
+    const href = link.getAttribute("href");
+
+    // links into other papers carry their preview with them
+    if (link.dataset.preview) {
+      popup.innerHTML = link.dataset.preview;
+      showPopup(link);
+      typesetPopup();
+    } else if (href && href.startsWith("#")) {
+      const targetId = href.substring(1);
+      const targetEl = document.getElementById(targetId);
+      // sections of a split paper that are not loaded yet have a preview
+      const preview = targetEl
+        ? targetEl.innerHTML
+        : window.paperSplit && window.paperSplit.preview(targetId);
+
+      if (preview) {
+        popup.innerHTML = preview;
+        showPopup(link);
+
+        // Optional: process MathJax
+        typesetPopup();
       }
-    });
+    }
+  });
 
-    link.addEventListener("mouseleave", function () {
+  document.addEventListener("mouseout", (e) => {
+    const link = e.target.closest("a");
+    if (link && !popup.contains(link) && !link.contains(e.relatedTarget)) {
       popup.style.display = "none";
-    });
+    }
   });
 
+  function typesetPopup() {
+    if (window.MathJax && window.MathJax.typesetPromise) {
+      MathJax.typesetPromise([popup]).catch((err) => {
+        console.log("MathJax error in popup:", err);
+      });
+    }
+  }
+
   function showPopup(element) {
     popup.style.display = "block";
 
@@ -13,7 +13,10 @@ from .conversion import (
     TexReader,
     convert,
     ErrorVisitor,
+    tex_args,
+    tex_body,
 )
+from .macros import MacroTable
 
 __all__ = [
     "main_cli",
@@ -26,4 +29,7 @@ __all__ = [
     "TexReader",
     "convert",
     "ErrorVisitor",
+    "tex_args",
+    "tex_body",
+    "MacroTable",
 ]
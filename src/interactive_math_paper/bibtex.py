@@ -0,0 +1,481 @@
+import hashlib
+import html
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+MONTHS = {
+    "jan": "January",
+    "feb": "February",
+    "mar": "March",
+    "apr": "April",
+    "may": "May",
+    "jun": "June",
+    "jul": "July",
+    "aug": "August",
+    "sep": "September",
+    "oct": "October",
+    "nov": "November",
+    "dec": "December",
+}
+ACCENTS = {
+    '"': "\u0308",
+    "'": "\u0301",
+    "`": "\u0300",
+    "^": "\u0302",
+    "~": "\u0303",
+    "=": "\u0304",
+    ".": "\u0307",
+    "c": "\u0327",
+    "v": "\u030c",
+    "u": "\u0306",
+    "H": "\u030b",
+}
+SYMBOLS = {
+    "ss": "ß",
+    "o": "ø",
+    "O": "Ø",
+    "l": "ł",
+    "L": "Ł",
+    "aa": "å",
+    "AA": "Å",
+    "ae": "æ",
+    "AE": "Æ",
+    "i": "ı",
+    "&": "&",
+    "%": "%",
+    "_": "_",
+    "$": "\\$",
+}
+WHITESPACE = re.compile(r"\s+")
+# bump whenever BibEntry or the parser changes, stale caches are then reparsed
+CACHE_VERSION = 3
+BIBITEM = re.compile(r"\\bibitem\s*(?:\[((?:[^\[\]{}]|\{[^{}]*\})*)\])?\s*\{([^{}]*)\}")
+
+
+@dataclass
+class BibEntry:
+    key: str
+    type: str
+    fields: dict[str, str] = field(default_factory=dict)
+
+    def get(self, name: str, default: str = "") -> str:
+        return self.fields.get(name, default)
+
+    def authors(self) -> list[tuple[str, str]]:
+        """Returns the (first, last) names of the authors, or editors."""
+        names = self.get("author") or self.get("editor")
+        if not names:
+            return []
+        people: list[list[str]] = [[]]
+        for word in _split_words(names):
+            if word.lower() == "and":
+                people.append([])
+            else:
+                people[-1].append(word)
+        output = []
+        for words in people:
+            if not words:
+                continue
+            name = " ".join(words)
+            if "," in name:
+                last, first = name.split(",", 1)
+            else:
+                first, last = " ".join(words[:-1]), words[-1]
+            output.append((first.strip(), last.strip()))
+        return output
+
+
+def _split_words(text: str) -> list[str]:
+    """Splits on whitespace outside of braces, so {van Dam} stays one word."""
+    words = [""]
+    depth = 0
+    for char in text:
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        if char.isspace() and depth == 0:
+            if words[-1]:
+                words.append("")
+            continue
+        words[-1] += char
+    return [word for word in words if word]
+
+
+class BibParseError(ValueError): ...
+
+
+class _BibParser:
+    def __init__(self, text: str):
+        self.text = text
+        self.position = 0
+        self.strings = dict(MONTHS)
+        self.errors: list[BibParseError] = []
+
+    def error(self, message: str) -> BibParseError:
+        return BibParseError(message)
+
+    def skip_spaces(self):
+        while self.position < len(self.text) and self.text[self.position].isspace():
+            self.position += 1
+
+    def read_name(self) -> str:
+        self.skip_spaces()
+        match = re.compile(r"[^\s,={}()\"#]+").match(self.text, self.position)
+        if match is None:
+            raise self.error("expected a name")
+        self.position = match.end()
+        return match.group(0)
+
+    def expect(self, chars: str) -> str:
+        self.skip_spaces()
+        if self.position >= len(self.text) or self.text[self.position] not in chars:
+            raise self.error(f"expected one of {chars!r}")
+        self.position += 1
+        return self.text[self.position - 1]
+
+    def read_delimited(self, closing: str) -> str:
+        start = self.position
+        depth = 0
+        while self.position < len(self.text):
+            char = self.text[self.position]
+            if char == "\\":
+                self.position += 2
+                continue
+            if char == "{":
+                depth += 1
+            elif char == "}" and depth > 0:
+                depth -= 1
+            elif char == closing and depth == 0:
+                self.position += 1
+                return self.text[start : self.position - 1]
+            self.position += 1
+        raise self.error("unterminated value")
+
+    def read_value(self) -> str:
+        parts = []
+        while True:
+            self.skip_spaces()
+            char = self.text[self.position : self.position + 1]
+            if char == "{":
+                self.position += 1
+                parts.append(self.read_delimited("}"))
+            elif char == '"':
+                self.position += 1
+                parts.append(self.read_delimited('"'))
+            else:
+                name = self.read_name()
+                parts.append(
+                    name if name.isdigit() else self.strings.get(name.lower(), "")
+                )
+            self.skip_spaces()
+            if not self.text.startswith("#", self.position):
+                return "".join(parts)
+            self.position += 1
+
+    def read_fields(self, closing: str) -> dict[str, str]:
+        fields = {}
+        while True:
+            self.skip_spaces()
+            if self.text.startswith(closing, self.position):
+                self.position += 1
+                return fields
+            name = self.read_name().lower()
+            self.expect("=")
+            fields[name] = WHITESPACE.sub(" ", self.read_value()).strip()
+            if self.expect("," + closing) == closing:
+                return fields
+
+    def entries(self):
+        while True:
+            self.position = self.text.find("@", self.position)
+            if self.position == -1:
+                return
+            start = self.position
+            try:
+                yield from self.entry()
+            except BibParseError as error:
+                # like bibtex, skip to the next @ and keep going
+                line = self.text.count("\n", 0, start) + 1
+                self.errors.append(BibParseError(f"line {line}: {error}"))
+                self.position = start + 1
+
+    def entry(self):
+        self.position += 1
+        entry_type = self.read_name().lower()
+        closing = "}" if self.expect("{(") == "{" else ")"
+        if entry_type == "comment":
+            self.read_delimited(closing)
+        elif entry_type == "preamble":
+            self.read_value()
+            self.expect(closing)
+        elif entry_type == "string":
+            self.strings.update(self.read_fields(closing))
+        else:
+            key = self.read_name()
+            if self.expect("," + closing) == closing:
+                yield BibEntry(key, entry_type)
+                return
+            yield BibEntry(key, entry_type, self.read_fields(closing))
+
+
+def parse_bib(text: str, errors: Optional[list[str]] = None) -> dict[str, BibEntry]:
+    """Parses a BibTeX database into entries indexed by lowercase citation key.
+
+    Malformed entries are skipped, their messages are appended to `errors`.
+    """
+    parser = _BibParser(text)
+    entries = {entry.key.lower(): entry for entry in parser.entries()}
+    if errors is not None:
+        errors.extend(str(error) for error in parser.errors)
+    return entries
+
+
+def parse_bbl(text: str) -> list[tuple[str, str, str]]:
+    """Reads the (label, key, html) items of a compiled `.bbl` bibliography."""
+    text = text.split("\\end{thebibliography}", 1)[0]
+    items = list(BIBITEM.finditer(text))
+    output = []
+    for index, item in enumerate(items):
+        end = items[index + 1].start() if index + 1 < len(items) else len(text)
+        body = re.sub(r"(?<!\\)%.*", "", text[item.end() : end])
+        body = re.sub(r"\\(newblock|url|doi|path)\b\s*", "", body)
+        label = detex(item.group(1)) if item.group(1) else str(index + 1)
+        output.append((label, item.group(2).strip(), detex(body.strip())))
+    return output
+
+
+class BibDatabase:
+    """A parsed `.bib` file, shared between all papers that use it.
+
+    Databases are cached in memory for the lifetime of the process and on disk
+    (in `cache_dir`) across runs, keyed by the resolved path of the file
+    together with its modification time and size, so each shared `.bib` file
+    is only parsed again after it changes.
+    """
+
+    cache_dir = (
+        Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+        / "interactive_math_paper"
+        / "bib"
+    )
+    _loaded: dict[Path, "BibDatabase"] = {}
+
+    def __init__(
+        self,
+        path: Path,
+        stamp: tuple[int, int],
+        entries: dict[str, BibEntry],
+        errors: list[str],
+    ):
+        self.path = path
+        self.stamp = stamp
+        self.entries = entries
+        # messages of the malformed entries that were skipped
+        self.errors = errors
+
+    def __contains__(self, key: str) -> bool:
+        return key.lower() in self.entries
+
+    def get(self, key: str) -> Optional[BibEntry]:
+        return self.entries.get(key.lower())
+
+    @staticmethod
+    def load(path: Path) -> "BibDatabase":
+        path = path.resolve()
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        loaded = BibDatabase._loaded.get(path)
+        if loaded is not None and loaded.stamp == stamp:
+            return loaded
+
+        cache_file = BibDatabase._cache_file(path)
+        cached = BibDatabase._read_cache(cache_file, stamp)
+        if cached is None:
+            errors: list[str] = []
+            entries = parse_bib(BibDatabase._read_text(path, errors), errors)
+            BibDatabase._write_cache(cache_file, stamp, entries, errors)
+        else:
+            entries, errors = cached
+        database = BibDatabase(path, stamp, entries, errors)
+        BibDatabase._loaded[path] = database
+        return database
+
+    @staticmethod
+    def _read_text(path: Path, errors: list[str]) -> str:
+        data = path.read_bytes()
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError as error:
+            # older .bib files are often Latin-1, which decodes any byte
+            line = data.count(b"\n", 0, error.start) + 1
+            errors.append(f"line {line}: not valid UTF-8, read as Latin-1")
+            return data.decode("latin-1")
+
+    @staticmethod
+    def _cache_file(path: Path) -> Path:
+        digest = hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:32]
+        return BibDatabase.cache_dir / f"{digest}.json"
+
+    @staticmethod
+    def _read_cache(
+        cache_file: Path, stamp: tuple[int, int]
+    ) -> Optional[tuple[dict[str, BibEntry], list[str]]]:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["version"] != CACHE_VERSION or cached["stamp"] != list(stamp):
+                return None
+            entries = {
+                key: BibEntry(entry["key"], entry["type"], entry["fields"])
+                for key, entry in cached["entries"].items()
+            }
+            return entries, list(cached["errors"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _write_cache(
+        cache_file: Path,
+        stamp: tuple[int, int],
+        entries: dict[str, BibEntry],
+        errors: list[str],
+    ):
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first so concurrent runs never see a
+            # partially written cache
+            fd, temporary = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+            cached = {
+                "version": CACHE_VERSION,
+                "stamp": list(stamp),
+                "entries": {key: asdict(entry) for key, entry in entries.items()},
+                "errors": errors,
+            }
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cached, f, ensure_ascii=False)
+            os.replace(temporary, cache_file)
+        except OSError:
+            pass
+
+
+def detex(text: str) -> str:
+    """Turns the tex markup commonly found in bib fields into html, keeping math."""
+    output = []
+    for index, part in enumerate(re.split(r"(\$[^$]*\$)", text)):
+        if index % 2 == 1:
+            output.append(html.escape(part, quote=False))
+            continue
+        part = re.sub(
+            r"\\([\"'`^~=.cvuH])\s*\{?\\?([a-zA-Z])\}?",
+            lambda match: match.group(2) + ACCENTS[match.group(1)],
+            part,
+        )
+        part = re.sub(
+            r"\\(ss|aa|AA|ae|AE|[oOlLi&%_$])(?![a-zA-Z])\s*",
+            lambda match: SYMBOLS[match.group(1)],
+            part,
+        )
+        part = html.escape(part, quote=False)
+        part = re.sub(r"\\(emph|textit|textbf|textrm|mathrm)\s*", "", part)
+        part = part.replace("---", "—").replace("--", "–").replace("~", "&nbsp;")
+        part = part.replace("{", "").replace("}", "")
+        output.append(part)
+    return unicodedata.normalize("NFC", "".join(output))
+
+
+STYLES = ("plain", "unsrt", "alpha", "abbrv")
+
+
+def sort_entries(entries: list[BibEntry], style: Optional[str]) -> list[BibEntry]:
+    """Orders the cited entries, which are given in order of first citation."""
+    if style in ("plain", "alpha", "abbrv"):
+        return sorted(
+            entries,
+            key=lambda entry: (
+                [last.lower() for _, last in entry.authors()],
+                entry.get("year"),
+                entry.get("title").lower(),
+            ),
+        )
+    return entries
+
+
+def entry_labels(entries: list[BibEntry], style: Optional[str]) -> dict[str, str]:
+    """Computes the label shown for each entry, keyed by lowercase citation key."""
+    if style in ("plain", "unsrt", "abbrv"):
+        return {entry.key.lower(): str(i + 1) for i, entry in enumerate(entries)}
+    if style != "alpha":
+        return {entry.key.lower(): entry.key for entry in entries}
+    labels = {}
+    used: dict[str, int] = {}
+    for entry in entries:
+        lasts = [re.sub(r"[^A-Za-z]", "", detex(last)) for _, last in entry.authors()]
+        if len(lasts) == 1:
+            prefix = lasts[0][:3]
+        else:
+            prefix = "".join(last[:1] for last in lasts[:4])
+            prefix += "+" if len(lasts) > 4 else ""
+        label = (prefix or entry.key[:3]) + entry.get("year")[-2:]
+        used[label] = used.get(label, 0) + 1
+        labels[entry.key.lower()] = label
+    suffixes: dict[str, int] = {}
+    for key, label in labels.items():
+        if used[label] > 1:
+            suffixes[label] = suffixes.get(label, 0) + 1
+            labels[key] = label + chr(ord("a") + suffixes[label] - 1)
+    return labels
+
+
+def format_names(entry: BibEntry, style: Optional[str]) -> str:
+    names = []
+    for first, last in entry.authors():
+        if style == "abbrv" and first:
+            first = " ".join(part[0] + "." for part in first.split() if part)
+        names.append(f"{first} {last}".strip())
+    if len(names) > 2:
+        return ", ".join(names[:-1]) + ", and " + names[-1]
+    return " and ".join(names)
+
+
+def format_entry(entry: BibEntry, style: Optional[str] = None) -> str:
+    """Renders an entry as html in the usual "Authors. Title. Venue, year." shape."""
+    blocks = []
+    names = format_names(entry, style)
+    if names:
+        blocks.append(names)
+    if entry.get("title"):
+        blocks.append(entry.get("title"))
+
+    venue = entry.get("journal") or entry.get("booktitle") or entry.get("publisher")
+    details = [f"<i>{detex(venue)}</i>"] if venue else []
+    if entry.get("volume"):
+        volume = entry.get("volume")
+        if entry.get("number"):
+            volume += f"({entry.get('number')})"
+        details.append(detex(volume))
+    if entry.get("pages"):
+        details.append(detex(entry.get("pages")))
+    date = entry.get("year")
+    if entry.get("month"):
+        date = f"{entry.get('month')} {date}".strip()
+    if date:
+        details.append(detex(date))
+
+    html_blocks = [detex(block) for block in blocks]
+    if details:
+        html_blocks.append(", ".join(details))
+    text = ". ".join(block.rstrip(".") for block in html_blocks)
+    if entry.get("doi"):
+        doi = html.escape(entry.get("doi"))
+        text += f'. <a href="https://doi.org/{doi}">doi:{doi}</a>'
+    elif entry.get("url"):
+        url = html.escape(entry.get("url"))
+        text += f'. <a href="{url}">{url}</a>'
+    return text + "."
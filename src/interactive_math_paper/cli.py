@@ -1,24 +1,45 @@
 import sys
 from pathlib import Path
 from .visitors import DefaultTexVisitor, MathModeVisitor, AmsMathVisitor, TheoremVisitor
+from .visitors.search import SearchIndex, SearchVisitor
+from .visitors.graphicx import GraphicsVisitor
+from .visitors.split import SplitVisitor, fragment_js
+from .visitors.xr import collect_label_records
+from .labeldb import LabelDatabase
 from .conversion import (
     lex_tex_source,
     convert,
     TexReader,
     ErrorVisitor,
 )
+from .output import write_output, minify_html
 
 
 def main_cli():
-    if len(sys.argv) < 2:
-        print("Need args input.tex [output.html]")
+    flags = dict(
+        arg.partition("=")[::2] for arg in sys.argv[1:] if arg.startswith("--")
+    )
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    known_flags = ("--minify", "--compress", "--search", "--labels", "--split")
+    if (
+        len(args) < 1
+        or any(flag not in known_flags for flag in flags)
+        # --labels needs the path of the database
+        or flags.get("--labels") == ""
+    ):
+        print(
+            "Need args input.tex [output.html] [--minify] [--compress] [--search]"
+            " [--split] [--labels=labels.sqlite]"
+        )
         sys.exit(1)
 
-    input_file = Path(sys.argv[1])
-    output_file = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+    input_file = Path(args[0])
+    output_file = Path(args[1]) if len(args) > 1 else None
 
     if output_file is None:
         output_file = input_file.with_suffix(".html")
+    # sizes are only interesting when the output is minified or compressed
+    show_reports = "--minify" in flags or "--compress" in flags
 
     try:
         with open(input_file, "r", encoding="utf-8") as f:
@@ -30,18 +51,83 @@ def main_cli():
         print(f"Error reading file: {e}")
         sys.exit(1)
 
+    search_file = output_file.with_suffix(".search.js")
+    if "--search" in flags:
+        SearchVisitor(search_file.name)
+
+    fragment_dir = output_file.with_suffix(".fragments")
+    split = SplitVisitor(fragment_dir.name) if "--split" in flags else None
+
+    label_database = None
+    if flags.get("--labels"):
+        label_database = LabelDatabase(Path(flags["--labels"]))
+
+    tex = DefaultTexVisitor(input_file.parent, label_database)
+    math_mode = MathModeVisitor()
+    graphics = GraphicsVisitor(input_file.parent, output_file.parent)
     soup = lex_tex_source(latex_content)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(
-            convert(
-                soup,
-                TexReader(
-                    [DefaultTexVisitor(), MathModeVisitor()],
-                    ErrorVisitor(),
-                    {
-                        "amsthm": TheoremVisitor(),
-                        "amsmath": AmsMathVisitor(),
-                    },
-                ),
-            ).to_html()
+    root = convert(
+        soup,
+        TexReader(
+            [tex, math_mode],
+            ErrorVisitor(),
+            {
+                "amsthm": TheoremVisitor(),
+                "amsmath": AmsMathVisitor(math_mode),
+                "graphicx": graphics,
+            },
+        ),
+    )
+    for warning in tex.warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+    for name in graphics.missing:
+        print(f"Warning: graphics file {name} not found", file=sys.stderr)
+    if "--search" in flags:
+        report = write_output(
+            search_file,
+            SearchIndex.build(root).to_js(),
+            compress="--compress" in flags,
+        )
+        if show_reports:
+            print(report)
+    if split is not None:
+        html, paper = split.split(root)
+        fragment_dir.mkdir(exist_ok=True)
+        # drop fragments of an earlier run that had more sections
+        for pattern in ("*.js", "*.js.gz", "*.js.zst"):
+            for stale in fragment_dir.glob(pattern):
+                stale.unlink()
+        for fragment in paper.fragments:
+            fragment_html = paper.fragment_html(fragment)
+            script = fragment_js(fragment.index, fragment_html)
+            if "--minify" in flags:
+                minified = fragment_js(fragment.index, minify_html(fragment_html))
+            else:
+                minified = script
+            report = write_output(
+                fragment_dir / f"{fragment.index}.js",
+                minified,
+                compress="--compress" in flags,
+            )
+            # only the html inside the script is minified, count it as saved
+            report.original_size = len(script.encode("utf-8"))
+            if show_reports:
+                print(report)
+    else:
+        html = root.to_html()
+    graphics.store.finish()
+    if label_database is not None:
+        label_database.record(
+            output_file.stem,
+            output_file.name,
+            collect_label_records(root, output_file.name),
         )
+        label_database.close()
+    report = write_output(
+        output_file,
+        html,
+        minify="--minify" in flags,
+        compress="--compress" in flags,
+    )
+    if show_reports:
+        print(report)
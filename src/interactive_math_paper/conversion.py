@@ -4,18 +4,48 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
 from TexSoup import TexSoup, TexNode
-from TexSoup.data import TexEnv, TexCmd, Token, TexExpr, TexArgs
+from TexSoup.data import TexEnv, TexCmd, Token, TexExpr, TexText
+from .counters import Counters
 
 
 def lex_tex_source(tex: str) -> TexNode:
     return TexSoup(tex)
 
 
+def tex_args(expr: TexExpr) -> list[TexExpr]:
+    return list(expr.args)
+
+
+def tex_body(expr: TexExpr) -> list[Union[TexExpr, Token]]:
+    """The contents of `expr` without its arguments.
+
+    TexSoup's `contents` also yields the contents of the arguments; this view
+    reads the body directly, so the lexed tree is never modified and can be
+    cached and converted by several threads at once.
+    """
+    all_contents = list(expr.all)
+    argument_count = sum(len(list(arg.contents)) for arg in expr.args)
+    body = []
+    for content in all_contents[argument_count:]:
+        if isinstance(content, TexText):
+            content = content._text
+        if isinstance(content, str) and content.isspace():
+            if not expr.preserve_whitespace:
+                continue
+        body.append(content)
+    return body
+
+
 class HtmlNode:
     def __init__(self):
         self.args = []
         self.children = []
         self.parent = None
+        # element id to render, assigned by passes that need to link to the node
+        self.anchor: Optional[str] = None
+
+    def id_attribute(self) -> str:
+        return "" if self.anchor is None else f' id="{self.anchor}"'
 
     def add_argument(self, arg: "HtmlNode"):
         self.args.append(arg)
@@ -29,6 +59,13 @@ class HtmlNode:
             child.parent.children.remove(child)
         child.parent = self
 
+    def descendants(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.args + node.children))
+
     def children_to_html(self) -> str:
         html = ""
         for child in self.children:
@@ -49,12 +86,19 @@ T = TypeVar("T")
 
 
 class TexContext:
-    def __init__(self, nodes: list[HtmlNode], parents: list[HtmlNode]):
+    def __init__(
+        self,
+        nodes: list[HtmlNode],
+        parents: list[HtmlNode],
+        counters: Optional[Counters] = None,
+    ):
         self.nodes = nodes
         self.parents = parents
+        # shared by every copy, counters live for the whole conversion
+        self.counters = counters if counters is not None else Counters()
 
     def copy(self) -> "TexContext":
-        return TexContext(self.nodes.copy(), self.parents.copy())
+        return TexContext(self.nodes.copy(), self.parents.copy(), self.counters)
 
     def surrounding(self, type: Type[T]) -> Optional[T]:
         for node in self.parents[::-1]:
@@ -90,12 +134,14 @@ class Consumed(Enum):
     no = 0
     yes = 1
     also_children = 2
+    replaced = 3
 
 
 @dataclass
 class VisitResult:
     node: Optional[HtmlNode]
     consumed: Consumed
+    replacement: Optional[TexNode] = None
 
     @staticmethod
     def pass_by() -> "VisitResult":
@@ -115,12 +161,20 @@ class VisitResult:
             consumed=Consumed.yes if parse_children else Consumed.also_children,
         )
 
+    @staticmethod
+    def replace(replacement: TexNode) -> "VisitResult":
+        return VisitResult(
+            node=EmptyNode(), consumed=Consumed.replaced, replacement=replacement
+        )
+
 
 class TexVisitor(ABC):
     visitors = []
 
-    def __init__(self, id: str):
-        TexVisitor.visitors.append(self)
+    def __init__(self, id: str, register: bool = True):
+        # unregistered visitors add their assets once their package is used
+        if register:
+            TexVisitor.visitors.append(self)
         self.id = id
 
     @abstractmethod
@@ -160,6 +214,7 @@ class TexVisitor(ABC):
 class ReaderResult:
     node: HtmlNode
     consume_children: bool
+    replacement: Optional[TexNode] = None
 
 
 class DocumentNode(HtmlNode):
@@ -187,6 +242,8 @@ class TexReader:
             for key, value in self.packages.items():
                 if key in str(arg):
                     self.chain.append(value)
+                    if value not in TexVisitor.visitors:
+                        TexVisitor.visitors.append(value)
 
     def convert(self, node: Union[TexExpr, Token], context: TexContext) -> ReaderResult:
         self.parse_packages(node)
@@ -207,6 +264,13 @@ class TexReader:
             if result.consumed == Consumed.also_children:
                 assert result.node
                 return ReaderResult(node=result.node, consume_children=True)
+            if result.consumed == Consumed.replaced:
+                assert result.node
+                return ReaderResult(
+                    node=result.node,
+                    consume_children=True,
+                    replacement=result.replacement,
+                )
         raise ValueError("oops no error handling yet")
 
 
@@ -223,6 +287,12 @@ def convert(
     if not isinstance(node, TexExpr) and not isinstance(node, Token):
         raise ValueError(f"unknown object of type {type(node)}")
     result = visitor.convert(node, context)
+    if result.replacement is not None:
+        for child in tex_body(result.replacement.expr):
+            new_node = convert(child, visitor, context.copy())
+            context.nodes.append(new_node)
+            result.node.add_child(new_node)
+        return result.node
     if result.consume_children or isinstance(node, Token):
         return result.node
     html_node = result.node
@@ -230,18 +300,14 @@ def convert(
     context.nodes.extend(html_node.args)
     context.nodes.extend(html_node.children)
     context.parents.append(html_node)
-    args = node.args  # todo add test for the weird behaviour of contents
-    # todo maybe add feature request
-    for arg in node.args:
+    for arg in tex_args(node):
         new_node = convert(arg, visitor, context.copy())
         context.nodes.append(new_node)
         html_node.add_argument(new_node)
-    node.args = TexArgs()
-    for child in node.contents:
+    for child in tex_body(node):
         new_node = convert(child, visitor, context.copy())
         context.nodes.append(new_node)
         html_node.add_child(new_node)
-    node.args = args
     return html_node
 
 
@@ -0,0 +1,75 @@
+from typing import Optional
+
+
+class Counters:
+    """LaTeX counters of a single conversion.
+
+    Mirrors `\\newcounter`, `\\setcounter`, `\\addtocounter`, `\\stepcounter`
+    and `\\numberwithin`: stepping a counter resets every counter numbered
+    within it, and `format` renders a counter the way `\\the<counter>` would.
+    """
+
+    def __init__(self):
+        self.values: dict[str, int] = {}
+        self.within: dict[str, Optional[str]] = {}
+        self.dependents: dict[str, list[str]] = {}
+        self.new("section")
+        self.new("subsection", "section")
+        self.new("subsubsection", "subsection")
+        self.new("equation")
+        self.new("figure")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.values
+
+    def _check(self, name: str):
+        if name not in self.values:
+            raise ValueError(f"unknown counter {name}")
+
+    def new(self, name: str, within: Optional[str] = None):
+        if name in self.values:
+            raise ValueError(f"counter {name} already defined")
+        self.values[name] = 0
+        self.within[name] = None
+        self.dependents[name] = []
+        if within is not None:
+            self.number_within(name, within)
+
+    def number_within(self, name: str, within: str):
+        self._check(name)
+        self._check(within)
+        previous = self.within[name]
+        if previous is not None:
+            self.dependents[previous].remove(name)
+        self.within[name] = within
+        self.dependents[within].append(name)
+
+    def value(self, name: str) -> int:
+        self._check(name)
+        return self.values[name]
+
+    def set(self, name: str, value: int):
+        self._check(name)
+        self.values[name] = value
+
+    def add(self, name: str, value: int):
+        self._check(name)
+        self.values[name] += value
+
+    def step(self, name: str) -> int:
+        self._check(name)
+        self.values[name] += 1
+        resets = list(self.dependents[name])
+        while resets:
+            dependent = resets.pop()
+            self.values[dependent] = 0
+            resets.extend(self.dependents[dependent])
+        return self.values[name]
+
+    def format(self, name: str) -> str:
+        self._check(name)
+        within = self.within[name]
+        number = str(self.values[name])
+        if within is None:
+            return number
+        return f"{self.format(within)}.{number}"
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# tried in this order for \includegraphics{name} without an extension, formats
+# browsers show as images first, then the usual pdflatex and latex ones
+EXTENSIONS = (".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".pdf", ".eps")
+IMAGE_EXTENSIONS = {".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp"}
+# vector formats measure in big points, browsers in css pixels
+POINTS_TO_PIXELS = 96 / 72
+
+
+def _current_umask() -> int:
+    # os.umask can only be read by setting it, done once before any threads run
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# temporary files are created 0600, published files get the usual permissions
+# so a web server running as another user can read them
+FILE_MODE = 0o666 & ~_current_umask()
+MANIFEST = "manifest.json"
+
+
+@dataclass(frozen=True)
+class StoredFigure:
+    url: str
+    width: Optional[int]
+    height: Optional[int]
+
+
+def image_size(path: Path) -> tuple[Optional[int], Optional[int]]:
+    """Reads the pixel size from the image header, without decoding the image."""
+    with open(path, "rb") as f:
+        head = f.read(64)
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            if head[12:16] == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if head[12:16] == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if head[12:16] == b"VP8X":
+                width = int.from_bytes(head[24:27], "little") + 1
+                height = int.from_bytes(head[27:30], "little") + 1
+                return width, height
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return _jpeg_size(f)
+        f.seek(0)
+        if head.startswith(b"%PDF"):
+            return _pdf_size(f.read(1 << 20))
+        if head.startswith(b"%!PS"):
+            return _eps_size(f.read(1 << 16))
+        if path.suffix.lower() == ".svg":
+            return _svg_size(f.read(4096).decode("utf-8", "replace"))
+    return None, None
+
+
+def _jpeg_size(f) -> tuple[Optional[int], Optional[int]]:
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None, None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        # start of frame markers, except DHT, JPG and DAC
+        if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _points_size(box: re.Match) -> tuple[Optional[int], Optional[int]]:
+    left, bottom, right, top = (float(number) for number in box.groups())
+    return (
+        round((right - left) * POINTS_TO_PIXELS),
+        round((top - bottom) * POINTS_TO_PIXELS),
+    )
+
+
+def _pdf_size(data: bytes) -> tuple[Optional[int], Optional[int]]:
+    # page dictionaries inside compressed object streams are not found
+    number = rb"\s*(-?[\d.]+)"
+    box = re.search(rb"/MediaBox\s*\[" + number * 4 + rb"\s*\]", data)
+    return (None, None) if box is None else _points_size(box)
+
+
+def _eps_size(data: bytes) -> tuple[Optional[int], Optional[int]]:
+    number = rb"[ \t]*(-?[\d.]+)"
+    box = re.search(rb"%%BoundingBox:" + number * 4, data)
+    return (None, None) if box is None else _points_size(box)
+
+
+def _svg_size(text: str) -> tuple[Optional[int], Optional[int]]:
+    svg = re.search(r"<svg\b[^>]*>", text)
+    if svg is None:
+        return None, None
+    sizes = {}
+    for name in ("width", "height"):
+        match = re.search(rf'\b{name}\s*=\s*"([\d.]+)(px)?"', svg.group(0))
+        if match:
+            sizes[name] = round(float(match.group(1)))
+    if len(sizes) < 2:
+        view_box = re.search(
+            r'viewBox\s*=\s*"[\d.\-]+[ ,]+[\d.\-]+[ ,]+([\d.]+)[ ,]+([\d.]+)"',
+            svg.group(0),
+        )
+        if view_box:
+            return round(float(view_box.group(1))), round(float(view_box.group(2)))
+    return sizes.get("width"), sizes.get("height")
+
+
+class FigureStore:
+    """Copies graphics into `output_dir/figures` under content-hashed names.
+
+    A figure shared by several papers is stored once. Hashing and copying run
+    on a thread pool; `add` returns a future, so conversion keeps going while
+    the files are processed. Sources whose modification time and size match
+    the manifest of a previous run are neither read nor copied again.
+    """
+
+    def __init__(self, output_dir: Path, workers: Optional[int] = None):
+        self.directory = output_dir / "figures"
+        self.workers = workers
+        # started by the first `add`, papers without figures need no threads
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.futures: dict[Path, Future[StoredFigure]] = {}
+        self.manifest: dict[str, list] = self._read_manifest()
+
+    def _read_manifest(self) -> dict[str, list]:
+        try:
+            with open(self.directory / MANIFEST, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def resolve(name: str, search_dirs: list[Path]) -> Path:
+        for directory in search_dirs:
+            candidate = directory / name
+            if candidate.suffix and candidate.is_file():
+                return candidate
+            for extension in EXTENSIONS:
+                with_extension = candidate.with_name(candidate.name + extension)
+                if with_extension.is_file():
+                    return with_extension
+        raise FileNotFoundError(
+            f"graphics file {name} not found in {[str(d) for d in search_dirs]}"
+        )
+
+    def add(self, source: Path) -> Future[StoredFigure]:
+        source = source.resolve()
+        with self.lock:
+            if source not in self.futures:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers)
+                self.futures[source] = self.executor.submit(self._store, source)
+            return self.futures[source]
+
+    def _store(self, source: Path) -> StoredFigure:
+        stat = source.stat()
+        with self.lock:
+            cached = self.manifest.get(str(source))
+        if cached is not None:
+            mtime, size, name, width, height = cached
+            if (mtime, size) == (stat.st_mtime_ns, stat.st_size) and (
+                self.directory / name
+            ).is_file():
+                return StoredFigure(f"figures/{name}", width, height)
+
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        name = digest.hexdigest()[:20] + source.suffix.lower()
+        target = self.directory / name
+        if not target.is_file():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(source, temporary)
+            os.chmod(temporary, FILE_MODE)
+            os.replace(temporary, target)
+        width, height = image_size(source)
+        with self.lock:
+            self.manifest[str(source)] = [
+                stat.st_mtime_ns,
+                stat.st_size,
+                name,
+                width,
+                height,
+            ]
+        return StoredFigure(f"figures/{name}", width, height)
+
+    def finish(self):
+        """Waits for all pending copies and saves the manifest for the next run."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        for future in self.futures.values():
+            future.result()
+        if not self.futures:
+            return
+        with self.lock:
+            # other papers may share the directory, keep their entries
+            manifest = self._read_manifest()
+            manifest.update(self.manifest)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.chmod(temporary, FILE_MODE)
+            os.replace(temporary, self.directory / MANIFEST)
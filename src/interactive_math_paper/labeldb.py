@@ -0,0 +1,107 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    name TEXT PRIMARY KEY COLLATE NOCASE,
+    url TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    paper TEXT NOT NULL COLLATE NOCASE REFERENCES papers (name) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    anchor TEXT NOT NULL,
+    kind TEXT COLLATE NOCASE,
+    preview TEXT,
+    PRIMARY KEY (paper, label)
+);
+CREATE INDEX IF NOT EXISTS labels_by_tag ON labels (paper, kind, tag);
+"""
+
+
+@dataclass(frozen=True)
+class LabelRecord:
+    label: str
+    tag: str
+    anchor: str
+    kind: Optional[str] = None
+    preview: Optional[str] = None
+    url: str = ""
+
+    @property
+    def href(self) -> str:
+        return f"{self.url}#{self.anchor}"
+
+
+class LabelDatabase:
+    """SQLite store of the labels of every converted paper.
+
+    Lets a conversion resolve references into other papers by an indexed
+    lookup instead of reparsing them. Each paper is replaced in a single
+    transaction, and the database runs in WAL mode with a busy timeout so
+    parallel batch workers can write to it safely.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # autocommit mode, transactions are opened explicitly in record
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self._cache: dict[tuple[str, str], Optional[LabelRecord]] = {}
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, paper: str, url: str, records: list[LabelRecord]):
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("DELETE FROM papers WHERE name = ?", (paper,))
+            cursor.execute(
+                "INSERT INTO papers (name, url, updated) VALUES (?, ?, ?)",
+                (paper, url, time.time()),
+            )
+            cursor.executemany(
+                "INSERT OR REPLACE INTO labels"
+                " (paper, label, tag, anchor, kind, preview)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(paper, r.label, r.tag, r.anchor, r.kind, r.preview) for r in records],
+            )
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+        self._cache.clear()
+
+    def _one(self, query: str, parameters: tuple) -> Optional[LabelRecord]:
+        row = self.connection.execute(
+            "SELECT labels.label, labels.tag, labels.anchor, labels.kind,"
+            " labels.preview, papers.url"
+            " FROM labels JOIN papers ON labels.paper = papers.name"
+            f" WHERE {query} LIMIT 1",
+            parameters,
+        ).fetchone()
+        return None if row is None else LabelRecord(*row)
+
+    def lookup(self, paper: str, label: str) -> Optional[LabelRecord]:
+        key = (paper.lower(), label)
+        if key not in self._cache:
+            self._cache[key] = self._one(
+                "labels.paper = ? AND labels.label = ?", (paper, label)
+            )
+        return self._cache[key]
+
+    def lookup_tag(self, paper: str, kind: str, tag: str) -> Optional[LabelRecord]:
+        """Finds e.g. "Theorem 2.1" of a paper, as cited by \\cite[Theorem 2.1]{paper}."""
+        return self._one(
+            "labels.paper = ? AND labels.kind = ? AND labels.tag = ?",
+            (paper, kind, tag),
+        )
@@ -0,0 +1,195 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+CONTROL_SEQUENCE = re.compile(r"\\([a-zA-Z@]+|.)", re.DOTALL)
+PARAMETER = re.compile(r"#([1-9])")
+DEFINING_COMMANDS = (
+    "newcommand",
+    "renewcommand",
+    "providecommand",
+    "def",
+    "DeclareMathOperator",
+)
+
+
+@dataclass(frozen=True)
+class Macro:
+    name: str
+    arity: int
+    body: str
+    default: Optional[str] = None
+
+    def substitute(self, args: list[str]) -> str:
+        return PARAMETER.sub(lambda match: args[int(match.group(1)) - 1], self.body)
+
+
+class MacroTable:
+    """Compiled table of user macros that expands TeX source at build time.
+
+    Definitions are parsed from the source of `\\newcommand`, `\\renewcommand`,
+    `\\providecommand`, `\\def` and `\\DeclareMathOperator`. Expansions are
+    memoized until the next definition, and a macro that (directly or through
+    other macros) expands to itself raises a `ValueError`.
+    """
+
+    max_depth = 64
+
+    def __init__(self):
+        self.macros: dict[str, Macro] = {}
+        self._cache: dict[str, str] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.macros
+
+    def define(self, macro: Macro):
+        self.macros[macro.name] = macro
+        self._cache.clear()
+
+    def define_from_source(self, source: str) -> bool:
+        """Parses and stores a definition, returns False if it is not understood."""
+        macro = parse_definition(source)
+        if macro is None:
+            return False
+        if source.startswith("\\providecommand") and macro.name in self.macros:
+            return True
+        self.define(macro)
+        return True
+
+    def expand(self, source: str) -> str:
+        if not self.macros:
+            return source
+        if source not in self._cache:
+            self._cache[source] = self._expand(source, frozenset(), 0)
+        return self._cache[source]
+
+    def _expand(self, source: str, active: frozenset[str], depth: int) -> str:
+        if depth > self.max_depth:
+            raise ValueError(f"macro expansion exceeded depth {self.max_depth}")
+        output = []
+        position = 0
+        while True:
+            match = CONTROL_SEQUENCE.search(source, position)
+            if match is None:
+                output.append(source[position:])
+                return "".join(output)
+            output.append(source[position : match.start()])
+            name = match.group(1)
+            position = match.end()
+            if name not in self.macros:
+                output.append(match.group(0))
+                continue
+            if name in active:
+                raise ValueError(f"recursive definition of macro \\{name}")
+            macro = self.macros[name]
+            args = []
+            if macro.default is not None:
+                optional, position = _read_optional(source, position)
+                args.append(macro.default if optional is None else optional)
+            while len(args) < macro.arity:
+                argument, position = _read_argument(source, position)
+                if argument is None:
+                    raise ValueError(f"macro \\{name} is missing an argument")
+                args.append(argument)
+            args = [self._expand(arg, active, depth + 1) for arg in args]
+            expansion = self._expand(macro.substitute(args), active | {name}, depth + 1)
+            # keep "\foo bar" from collapsing into "\foobar" after expansion
+            if (
+                re.search(r"\\[a-zA-Z@]+$", expansion)
+                and position < len(source)
+                and source[position].isalpha()
+            ):
+                expansion += " "
+            output.append(expansion)
+
+
+def _skip_spaces(source: str, position: int) -> int:
+    while position < len(source) and source[position] in " \t\n":
+        position += 1
+    return position
+
+
+def _read_group(source: str, position: int, opening: str, closing: str):
+    depth = 0
+    index = position
+    while index < len(source):
+        char = source[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return source[position + 1 : index], index + 1
+        index += 1
+    raise ValueError(f"unbalanced {opening}{closing} in {source!r}")
+
+
+def _read_argument(source: str, position: int) -> tuple[Optional[str], int]:
+    position = _skip_spaces(source, position)
+    if position >= len(source):
+        return None, position
+    if source[position] == "{":
+        return _read_group(source, position, "{", "}")
+    match = CONTROL_SEQUENCE.match(source, position)
+    if match is not None:
+        return match.group(0), match.end()
+    return source[position], position + 1
+
+
+def _read_optional(source: str, position: int) -> tuple[Optional[str], int]:
+    start = _skip_spaces(source, position)
+    if start < len(source) and source[start] == "[":
+        return _read_group(source, start, "[", "]")
+    return None, position
+
+
+def parse_definition(source: str) -> Optional[Macro]:
+    """Parses the source of a single macro definition into a `Macro`."""
+    match = CONTROL_SEQUENCE.match(source)
+    if match is None or match.group(1) not in DEFINING_COMMANDS:
+        return None
+    command = match.group(1)
+    position = match.end()
+    starred = source.startswith("*", position)
+    if starred:
+        position += 1
+    name_source, position = _read_argument(source, position)
+    if name_source is None:
+        return None
+    name_match = CONTROL_SEQUENCE.fullmatch(name_source.strip())
+    if name_match is None:
+        return None
+    name = name_match.group(1)
+
+    if command.startswith("DeclareMathOperator"):
+        text, position = _read_argument(source, position)
+        if text is None:
+            return None
+        operator = "\\operatorname*" if starred else "\\operatorname"
+        return Macro(name, 0, f"{operator}{{{text}}}")
+
+    if command == "def":
+        parameters = re.match(r"(\s*#[1-9])*", source[position:])
+        assert parameters is not None
+        position += parameters.end()
+        numbers = PARAMETER.findall(parameters.group(0))
+        if numbers != [str(i + 1) for i in range(len(numbers))]:
+            return None
+        arity = len(numbers)
+        position = _skip_spaces(source, position)
+        if position >= len(source) or source[position] != "{":
+            # delimited parameters, e.g. \def\foo#1.{...}, are left to MathJax
+            return None
+        body, _ = _read_group(source, position, "{", "}")
+        return Macro(name, arity, body)
+
+    arity_source, position = _read_optional(source, position)
+    arity = int(arity_source) if arity_source else 0
+    default, position = _read_optional(source, position)
+    body, _ = _read_argument(source, position)
+    if body is None:
+        return None
+    return Macro(name, arity, body, default)
@@ -0,0 +1,136 @@
+import gzip
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# regions the html minifier does not collapse, matched in a single pass so one
+# region never ends up inside another: scripts and styles are minified on
+# their own, comments dropped, and the rest kept verbatim
+REGIONS = re.compile(
+    r"(?P<script><script\b[^>]*>)(?P<js>.*?)</script>"
+    r"|(?P<style><style\b[^>]*>)(?P<css>.*?)</style>"
+    r"|(?P<comment><!--(?!\[if).*?-->)"
+    r"|<pre\b.*?</pre>"
+    r"|<textarea\b.*?</textarea>"
+    r"|\$\$.*?\$\$"
+    r"|(?<!\\)\$.*?(?<!\\)\$"
+    r"|\\\(.*?\\\)"
+    r"|\\\[.*?\\\]",
+    re.DOTALL | re.IGNORECASE,
+)
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+WHITESPACE = re.compile(r"\s+")
+
+
+def _collapse_whitespace(text: str) -> str:
+    return WHITESPACE.sub(lambda match: "\n" if "\n" in match.group(0) else " ", text)
+
+
+def minify_css(css: str) -> str:
+    css = CSS_COMMENT.sub("", css)
+    css = WHITESPACE.sub(" ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_js(js: str) -> str:
+    # line based on purpose: keeping the newlines keeps automatic semicolon
+    # insertion and template literals (e.g. the MathJax preamble) intact
+    lines = []
+    for line in js.splitlines():
+        line = line.strip()
+        if line == "" or line.startswith("//"):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def minify_html(html: str) -> str:
+    """Minifies html together with its inline css and js.
+
+    `<pre>`, `<textarea>` and math delimited by `$`, `$$`, `\\(` or `\\[` are
+    left untouched.
+    """
+    kept: list[str] = []
+
+    def keep(match: re.Match) -> str:
+        if match.group("comment"):
+            return ""
+        if match.group("script"):
+            text = f"{match.group('script')}{minify_js(match.group('js'))}</script>"
+        elif match.group("style"):
+            text = f"{match.group('style')}{minify_css(match.group('css'))}</style>"
+        else:
+            text = match.group(0)
+        kept.append(text)
+        return f"\0{len(kept) - 1}\0"
+
+    html = REGIONS.sub(keep, html)
+    html = _collapse_whitespace(html).strip()
+    return re.sub(r"\0(\d+)\0", lambda match: kept[int(match.group(1))], html)
+
+
+@dataclass
+class OutputReport:
+    path: Path
+    original_size: int
+    written_size: int
+    compressed: dict[str, int]
+
+    @property
+    def saved(self) -> int:
+        return self.original_size - self.written_size
+
+    def __str__(self) -> str:
+        text = f"{self.path}: {self.written_size} bytes"
+        if self.saved:
+            text += f" (saved {self.saved} of {self.original_size})"
+        for suffix, size in self.compressed.items():
+            text += f", {suffix} {size} bytes"
+        return text
+
+
+def write_output(
+    path: Path,
+    html: str,
+    minify: bool = False,
+    compress: bool = False,
+    zstd: Optional[bool] = None,
+) -> OutputReport:
+    """Writes `html` to `path`, optionally minified and with precompressed siblings.
+
+    With `compress`, a `.gz` sibling is written next to the file, and a `.zst`
+    sibling as well if `zstandard` is installed (or `zstd` is set explicitly).
+    """
+    original = html.encode("utf-8")
+    data = minify_html(html).encode("utf-8") if minify else original
+    with open(path, "wb") as f:
+        f.write(data)
+
+    compressed = {}
+    if compress:
+        # mtime=0 so unchanged output produces byte-identical archives
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        _write_sibling(path, ".gz", gzipped)
+        compressed[".gz"] = len(gzipped)
+        if zstd is None:
+            zstd = zstandard is not None
+        if zstd:
+            if zstandard is None:
+                raise ImportError("zstd output requires the zstandard package")
+            zstd_data = zstandard.ZstdCompressor(level=19).compress(data)
+            _write_sibling(path, ".zst", zstd_data)
+            compressed[".zst"] = len(zstd_data)
+    return OutputReport(path, len(original), len(data), compressed)
+
+
+def _write_sibling(path: Path, suffix: str, data: bytes):
+    with open(path.with_name(path.name + suffix), "wb") as f:
+        f.write(data)
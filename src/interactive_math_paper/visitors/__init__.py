@@ -2,5 +2,16 @@ from .tex import DefaultTexVisitor
 from .math_mode import MathModeVisitor
 from .amsthm import TheoremVisitor
 from .amsmath import AmsMathVisitor
+from .search import SearchVisitor
+from .graphicx import GraphicsVisitor
+from .split import SplitVisitor
 
-__all__ = ["DefaultTexVisitor", "MathModeVisitor", "TheoremVisitor", "AmsMathVisitor"]
+__all__ = [
+    "DefaultTexVisitor",
+    "MathModeVisitor",
+    "TheoremVisitor",
+    "AmsMathVisitor",
+    "SearchVisitor",
+    "GraphicsVisitor",
+    "SplitVisitor",
+]
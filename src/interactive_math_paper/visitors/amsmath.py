@@ -1,23 +1,41 @@
+import re
 from typing import override
 from TexSoup.data import TexEnv, TexCmd, Token
 from ..conversion import TexVisitor, VisitResult, TexContext
-from .tex import TextNode
+from .tex import TextNode, DefaultTexVisitor
+from .math_mode import MathModeVisitor
 
 
 class AmsMathVisitor(TexVisitor):
-    def __init__(self):
+    def __init__(self, math_mode: MathModeVisitor):
         super().__init__("amsmath")
+        # shares the macros defined in the paper
+        self.math_mode = math_mode
 
     @override
     def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
         if env.name == "equation":
-            return VisitResult.use(TextNode(str(env)), False)
+            source = self.math_mode.expand(str(env))
+            if not re.search(r"\\(tag|notag|nonumber)\b", source):
+                context.counters.step("equation")
+                tag = context.counters.format("equation")
+                for label_id in re.findall(r"\\label\{([^}]*)\}", source):
+                    DefaultTexVisitor.labels[label_id] = tag
+                # number on our side so MathJax shows the same tag that \ref uses
+                end = source.rindex("\\end{equation}")
+                source = f"{source[:end]}\\tag{{{tag}}}{source[end:]}"
+            return VisitResult.use(TextNode(source), False)
         return VisitResult.pass_by()
 
     @override
     def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
         if cmd.name == "hdots":
             return VisitResult.use(TextNode(r"\dots"))
+        if cmd.name == "numberwithin":
+            context.counters.number_within(
+                cmd.args[0].contents[0], cmd.args[1].contents[0]
+            )
+            return VisitResult.hidden(False)
         return VisitResult.pass_by()
 
     @override
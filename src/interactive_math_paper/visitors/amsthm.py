@@ -1,5 +1,5 @@
 from typing import override, Optional
-from TexSoup.data import TexEnv, TexCmd, Token
+from TexSoup.data import TexEnv, TexCmd, Token, BraceGroup, BracketGroup
 from ..conversion import TexVisitor, VisitResult, TexContext, HtmlNode
 from .tex import Label, Tag
 
@@ -11,47 +11,49 @@ class TheoremEnv(HtmlNode):
         self.tag = tag
         self.number = number
 
-    def _get_label(self) -> Optional[str]:
+    def _get_label_node(self) -> Optional[Label]:
         for child in self.children:
             if isinstance(child, Label):
-                return child.label_id
+                return child
         return None
 
+    def _get_label(self) -> Optional[str]:
+        label = self._get_label_node()
+        return None if label is None else label.label_id
+
     @override
     def to_html(self) -> str:
         citation = ""
         if len(self.args) == 1:
             citation = self.args[0].to_html()
+        label = self._get_label_node()
+        if label is not None:
+            label.on_parent = True
         id_text = "" if not self._get_label() else f'id = "{self._get_label()}"'
+        if not id_text and self.anchor is not None:
+            id_text = f'id = "{self.anchor}"'
+        heading = f"{self.label} {self.tag}" if self.tag else self.label
         return f"""<div class="theorem" {id_text}>
-            <span class="theorem-label">{self.label} {self.tag}. {citation}</span> {self.children_to_html()}
+            <span class="theorem-label">{heading}. {citation}</span> {self.children_to_html()}
         </div>"""
 
 
 class TheoremVisitor(TexVisitor):
-    previous_tag = None
-
     def __init__(self):
         super().__init__("amsthm")
         self.labels = {}
+        # environment name -> counter name, None for unnumbered environments
+        self.counters: dict[str, Optional[str]] = {}
 
     @override
     def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
         if env.name in self.labels:
-            last_env = context.first(TheoremEnv)
-            next_number = last_env.number + 1 if last_env else 1
-            if TheoremVisitor.previous_tag != context.first(Tag):
-                TheoremVisitor.previous_tag = context.first(Tag)
-                next_number = 1
-            theorem_tag = (context.first(Tag) or Tag("")).tag
-            if theorem_tag == "??":
-                theorem_tag = ""
-            theorem_tag = (
-                f"{theorem_tag}.{next_number}"
-                if theorem_tag != ""
-                else str(next_number)
-            )
-            environment = TheoremEnv(next_number, self.labels[env.name], theorem_tag)
+            counter = self.counters[env.name]
+            if counter is None:
+                return VisitResult.use(TheoremEnv(0, self.labels[env.name], ""))
+            number = context.counters.step(counter)
+            theorem_tag = context.counters.format(counter)
+            environment = TheoremEnv(number, self.labels[env.name], theorem_tag)
             environment.add_child(Tag(theorem_tag))
 
             return VisitResult.use(environment)
@@ -59,8 +61,24 @@ class TheoremVisitor(TexVisitor):
 
     @override
     def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
-        if cmd.name == "newtheorem":
-            self.labels[cmd.args[0].contents[0]] = cmd.args[1].contents[0]
+        if cmd.name == "newtheorem" or cmd.name == "newtheorem*":
+            # \newtheorem{name}[shared]{Label} or \newtheorem{name}{Label}[within]
+            braces = [
+                arg.contents[0] for arg in cmd.args if isinstance(arg, BraceGroup)
+            ]
+            brackets = [
+                arg.contents[0] for arg in cmd.args if isinstance(arg, BracketGroup)
+            ]
+            name, label = braces[0], braces[1]
+            self.labels[name] = label
+            if cmd.name == "newtheorem*":
+                self.counters[name] = None
+            elif brackets and isinstance(cmd.args[1], BracketGroup):
+                self.counters[name] = brackets[0]
+            else:
+                within = brackets[0] if brackets else None
+                context.counters.new(name, within)
+                self.counters[name] = name
             return VisitResult.hidden(False)
         return VisitResult.pass_by()
 
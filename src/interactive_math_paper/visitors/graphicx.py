@@ -0,0 +1,148 @@
+import html
+import re
+from concurrent.futures import Future
+from pathlib import Path
+from typing import override, Optional
+from TexSoup.data import TexEnv, TexCmd, Token
+from ..conversion import TexVisitor, VisitResult, TexContext, HtmlNode
+from ..figures import FigureStore, StoredFigure, IMAGE_EXTENSIONS
+from .tex import Label, Tag
+
+RELATIVE_WIDTH = re.compile(r"([\d.]*)\s*\\(textwidth|linewidth|columnwidth|hsize)")
+
+
+class Figure(HtmlNode):
+    def __init__(self, tag: str):
+        super().__init__()
+        self.tag = tag
+
+    @override
+    def to_html(self) -> str:
+        id_text = self.id_attribute()
+        labels = [child for child in self.children if isinstance(child, Label)]
+        if labels:
+            labels[-1].on_parent = True
+            id_text = f' id="{labels[-1].label_id}"'
+        return f"<figure{id_text}>{self.children_to_html()}</figure>"
+
+
+class Caption(HtmlNode):
+    def __init__(self, tag: Optional[str]):
+        super().__init__()
+        self.tag = tag
+
+    @override
+    def to_html(self) -> str:
+        prefix = f"Figure {self.tag}: " if self.tag else ""
+        return f"<figcaption>{prefix}{self.args[-1].to_html()}</figcaption>"
+
+
+class IncludeGraphics(HtmlNode):
+    def __init__(self, figure: Future[StoredFigure], options: dict[str, str]):
+        super().__init__()
+        self.figure = figure
+        self.options = options
+
+    @override
+    def to_html(self) -> str:
+        figure = self.figure.result()
+        extension = Path(figure.url).suffix
+        if extension == ".eps":
+            # browsers cannot show postscript at all, offer the file instead
+            return f'<a class="graphics-file" href="{figure.url}">EPS figure</a>'
+        width, height = figure.width, figure.height
+        attributes = f'src="{figure.url}" alt="" loading="lazy" decoding="async"'
+        if extension not in IMAGE_EXTENSIONS:
+            attributes = f'data="{figure.url}" type="application/pdf"'
+        if "scale" in self.options and width and height:
+            scale = float(self.options["scale"])
+            width, height = round(width * scale), round(height * scale)
+        # width and height let the browser reserve the space before loading
+        if width and height:
+            attributes += f' width="{width}" height="{height}"'
+        style = ""
+        relative = RELATIVE_WIDTH.fullmatch(self.options.get("width", ""))
+        if relative:
+            style = f"width: {float(relative.group(1) or 1) * 100:g}%"
+        elif "width" in self.options:
+            style = f"width: {self.options['width']}"
+        elif "height" in self.options:
+            style = f"height: {self.options['height']}; width: auto"
+        if style:
+            attributes += f' style="{style}"'
+        if extension not in IMAGE_EXTENSIONS:
+            fallback = f'<a class="graphics-file" href="{figure.url}">PDF figure</a>'
+            return f"<object {attributes}>{fallback}</object>"
+        return f"<img {attributes}>"
+
+
+class MissingGraphics(HtmlNode):
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+    @override
+    def to_html(self) -> str:
+        name = html.escape(self.name)
+        return f'<span class="graphics-missing">[missing figure {name}]</span>'
+
+
+def _parse_options(text: str) -> dict[str, str]:
+    options = {}
+    for option in text.split(","):
+        key, _, value = option.partition("=")
+        if key.strip():
+            options[key.strip()] = value.strip()
+    return options
+
+
+class GraphicsVisitor(TexVisitor):
+    def __init__(self, base_path: Path, output_dir: Path):
+        # only papers using graphicx get its assets
+        super().__init__("graphicx", register=False)
+        self.search_dirs = [base_path]
+        self.base_path = base_path
+        self.store = FigureStore(output_dir)
+        self.missing: list[str] = []
+
+    @override
+    def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
+        if env.name == "figure" or env.name == "figure*":
+            context.counters.step("figure")
+            tag = context.counters.format("figure")
+            figure = Figure(tag)
+            figure.add_child(Tag(tag))
+            return VisitResult.use(figure)
+        return VisitResult.pass_by()
+
+    @override
+    def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
+        if cmd.name == "includegraphics" or cmd.name == "includegraphics*":
+            name = str(cmd.args[-1].contents[0]).strip()
+            options = {}
+            if len(cmd.args) > 1:
+                options = _parse_options(str(cmd.args[0])[1:-1])
+            try:
+                source = FigureStore.resolve(name, self.search_dirs)
+            except FileNotFoundError:
+                self.missing.append(name)
+                return VisitResult.use(MissingGraphics(name), False)
+            return VisitResult.use(
+                IncludeGraphics(self.store.add(source), options), False
+            )
+        if cmd.name == "graphicspath":
+            paths = re.findall(r"\{([^{}]*)\}", str(cmd.args[0])[1:-1])
+            self.search_dirs = [self.base_path / path for path in paths] + [
+                self.base_path
+            ]
+            return VisitResult.hidden(False)
+        if cmd.name == "caption":
+            figure = context.surrounding(Figure)
+            return VisitResult.use(Caption(figure.tag if figure else None))
+        if cmd.name == "centering":
+            return VisitResult.hidden(False)
+        return VisitResult.pass_by()
+
+    @override
+    def visit_token(self, token: Token, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
@@ -1,6 +1,8 @@
 from typing import override
 from TexSoup.data import TexEnv, TexCmd, Token
-from ..conversion import TexVisitor, VisitResult, TexContext, HtmlNode
+from TexSoup.tokens import TC
+from ..conversion import TexVisitor, VisitResult, TexContext, HtmlNode, lex_tex_source
+from ..macros import MacroTable, DEFINING_COMMANDS
 from .tex import TextNode, HtmlBraces
 
 
@@ -17,12 +19,30 @@ class MathModeNode(HtmlNode):
 class MathModeVisitor(TexVisitor):
     def __init__(self):
         super().__init__("math_mode")
+        self.math_commands = ""
+        self.macros = MacroTable()
+        # sources of the definitions in macros, for MathJax if expanding fails
+        self.macro_definitions = ""
+        self.expansion_failed = False
 
-    math_commands = ""
+    def expand(self, source: str) -> str:
+        try:
+            return self.macros.expand(source)
+        except ValueError:
+            # e.g. an argument we cannot see, MathJax gets the definitions instead
+            self.expansion_failed = True
+            return source
 
     @override
     def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
         if env.name == "$" or env.name == "$$":
+            # expanded as a whole, so unbraced arguments like \norm x are seen
+            source = str(env)[len(env.name) : -len(env.name)]
+            expanded = self.expand(source)
+            if expanded != source:
+                return VisitResult.replace(
+                    lex_tex_source(f"{env.name}{expanded}{env.name}")
+                )
             return VisitResult.use(MathModeNode(env.name))
         if context.surrounding(MathModeNode):
             if env.name == "BraceGroup":
@@ -32,28 +52,42 @@ class MathModeVisitor(TexVisitor):
     @override
     def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
         if (context.surrounding(MathModeNode) is not None) or cmd.name == "eqref":
-            return VisitResult.use(TextNode(str(cmd) + " "), False)
-        if cmd.name == "renewcommand" or cmd.name == "newcommand" or cmd.name == "def":
-            MathModeVisitor.math_commands += str(cmd)
-            return VisitResult.hidden(False)
-        if cmd.name == "DeclareMathOperator":
-            assert len(cmd.args) == 2, (
-                f"declare math operator {str(cmd)} has a bad number of args"
-            )
-            operator_cmd = cmd.args[0].contents[0]
-            operator_text = cmd.args[1].contents[0]
-            MathModeVisitor.math_commands += (
-                f"\\newcommand{{{operator_cmd}}}{{\\text{{{operator_text}}}}}"
-            )
+            return VisitResult.use(TextNode(self.expand(str(cmd)) + " "), False)
+        if cmd.name.rstrip("*") in DEFINING_COMMANDS:
+            if self.macros.define_from_source(str(cmd)):
+                self.macro_definitions += str(cmd)
+            else:
+                # definitions we cannot expand ourselves are left to MathJax
+                self.math_commands += str(cmd)
             return VisitResult.hidden(False)
+        if cmd.name in self.macros:
+            try:
+                expanded = self.macros.expand(str(cmd))
+            except ValueError:
+                return VisitResult.pass_by()
+            return VisitResult.replace(lex_tex_source(expanded))
         return VisitResult.pass_by()
 
     @override
     def visit_token(self, token: Token, context: TexContext) -> VisitResult:
+        # control symbols like \| or \{ are math, not escaped text
+        if (
+            token.category == TC.EscapedComment
+            and context.surrounding(MathModeNode) is not None
+        ):
+            return VisitResult.use(TextNode(token.text))
         return VisitResult.pass_by()
 
     @override
     def global_js(self) -> str:
+        preamble = ""
+        math_commands = self.math_commands
+        if self.expansion_failed:
+            math_commands += self.macro_definitions
+        if math_commands:
+            preamble = f"""MathJax.tex2mml(String.raw`
+                            {math_commands}
+                          `);"""
         return f"""
         <!-- MathJax for mathematical notation -->
         <script>
@@ -68,9 +102,7 @@ class MathModeVisitor(TexVisitor):
                 ready: function () {{
                     MathJax.startup.defaultReady();
                     const {{STATE}} = MathJax._.core.MathItem;
-                          MathJax.tex2mml(String.raw`
-                            {self.math_commands}
-                          `);
+                          {preamble}
                     // Process math after page loads
                     MathJax.typesetPromise().then(() => {{
                         console.log('MathJax rendering complete');
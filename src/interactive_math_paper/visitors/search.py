@@ -0,0 +1,137 @@
+import html
+import json
+import re
+from dataclasses import dataclass
+from typing import override
+from TexSoup.data import TexEnv, TexCmd, Token
+from ..conversion import HtmlNode, TexVisitor, VisitResult, TexContext
+from .tex import HtmlBraces, EmBraces, Proof, Section, SectionAst
+from .amsthm import TheoremEnv
+from .math_mode import MathModeNode
+
+SNIPPET_LENGTH = 160
+TAG = re.compile(r"<[^>]+>")
+WORD = re.compile(r"[^\W_]+")
+
+
+def html_to_text(html_text: str) -> str:
+    return " ".join(html.unescape(TAG.sub(" ", html_text)).split())
+
+
+def tokenize(text: str) -> set[str]:
+    return {word for word in WORD.findall(text.lower()) if len(word) > 1}
+
+
+def _surrounding_text(node: HtmlNode, term: str) -> str:
+    if node.parent is None:
+        return ""
+    siblings = node.parent.children
+    index = siblings.index(node)
+    context = html_to_text(
+        "".join(
+            sibling.to_html() for sibling in siblings[max(index - 2, 0) : index + 3]
+        )
+    )
+    start = context.find(term) - SNIPPET_LENGTH // 2
+    if start <= 0:
+        return context
+    return context[start:].split(" ", 1)[-1]
+
+
+@dataclass
+class SearchDocument:
+    anchor: str
+    kind: str
+    title: str
+    text: str
+
+    def snippet(self) -> str:
+        if len(self.text) <= SNIPPET_LENGTH:
+            return self.text
+        return self.text[:SNIPPET_LENGTH].rsplit(" ", 1)[0] + " …"
+
+
+class SearchIndex:
+    """Inverted index over the sections, theorems, definitions and proofs of a paper.
+
+    Terms are stored sorted, so the client can find every term starting with a
+    query word by binary search, and each posting list holds document indices.
+    """
+
+    def __init__(self, documents: list[SearchDocument]):
+        self.documents = documents
+        postings: dict[str, list[int]] = {}
+        for index, document in enumerate(documents):
+            for term in tokenize(f"{document.title} {document.text}"):
+                postings.setdefault(term, []).append(index)
+        self.terms = sorted(postings.items())
+
+    @staticmethod
+    def build(root: HtmlNode) -> "SearchIndex":
+        documents = []
+        last_theorem = None
+
+        def add(node: HtmlNode, kind: str, title: str, text: str):
+            if node.anchor is None:
+                node.anchor = f"search-{len(documents)}"
+            documents.append(SearchDocument(node.anchor, kind, title, text))
+
+        inside_math = set()
+        for node in root.descendants():
+            if isinstance(node, MathModeNode) or id(node.parent) in inside_math:
+                inside_math.add(id(node))
+                continue
+            if isinstance(node, Section | SectionAst):
+                title = html_to_text(node.to_html())
+                add(node, "section", title, "")
+            elif isinstance(node, TheoremEnv):
+                last_theorem = f"{node.label} {node.tag}".strip()
+                label = node._get_label()
+                if label is not None:
+                    node.anchor = label
+                add(node, "theorem", last_theorem, html_to_text(node.to_html()))
+            elif isinstance(node, Proof):
+                title = f"Proof of {last_theorem}" if last_theorem else "Proof"
+                add(node, "proof", title, html_to_text(node.children_to_html()))
+            elif isinstance(node, HtmlBraces) and any(
+                isinstance(child, EmBraces) for child in node.children
+            ):
+                term = html_to_text(node.children_to_html())
+                add(node, "definition", term, _surrounding_text(node, term))
+        return SearchIndex(documents)
+
+    def to_json(self) -> str:
+        data = {
+            "docs": [
+                [document.anchor, document.kind, document.title, document.snippet()]
+                for document in self.documents
+            ],
+            "terms": [[term, indices] for term, indices in self.terms],
+        }
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    def to_js(self) -> str:
+        # a script instead of json so the index also loads from file:// urls
+        return f"window.paperSearch.loaded({self.to_json()});\n"
+
+
+class SearchVisitor(TexVisitor):
+    def __init__(self, index_url: str):
+        super().__init__("search")
+        self.index_url = index_url
+
+    @override
+    def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
+
+    @override
+    def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
+
+    @override
+    def visit_token(self, token: Token, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
+
+    @override
+    def global_js(self) -> str:
+        return f"<script>window.paperSearchIndexUrl = {json.dumps(self.index_url)};</script>"
@@ -0,0 +1,181 @@
+import html
+import json
+import re
+from dataclasses import dataclass, field
+from typing import override, Optional
+from TexSoup.data import TexEnv, TexCmd, Token
+from ..conversion import HtmlNode, TexVisitor, VisitResult, TexContext
+from .tex import (
+    Root,
+    Document,
+    Section,
+    SectionAst,
+    Bibliography,
+    BibtexBibliography,
+    BblBibliography,
+    Cite,
+    Ref,
+)
+from .search import html_to_text
+
+ID_ATTRIBUTE = re.compile(r'<(\w+)\b[^>]*?\bid\s*=\s*"([^"]*)"[^>]*>')
+VOID_ELEMENTS = {"img", "br", "hr", "input", "meta", "link", "source", "wbr"}
+# top-level nodes that start a new fragment
+FRAGMENT_STARTS = (
+    Section,
+    SectionAst,
+    Bibliography,
+    BibtexBibliography,
+    BblBibliography,
+)
+
+
+def _inner_html(text: str, start: re.Match) -> Optional[str]:
+    name = start.group(1).lower()
+    if name in VOID_ELEMENTS or start.group(0).endswith("/>"):
+        return None
+    depth = 1
+    tags = re.compile(rf"<(/?){name}\b[^>]*>", re.IGNORECASE)
+    for tag in tags.finditer(text, start.end()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return text[start.end() : tag.start()]
+    return None
+
+
+@dataclass
+class Fragment:
+    index: int
+    heading: HtmlNode
+    nodes: list[HtmlNode] = field(default_factory=list)
+
+    @property
+    def anchor(self) -> str:
+        return f"fragment-{self.index}"
+
+    def is_heading_shown(self) -> bool:
+        # bibliographies render their own heading
+        return isinstance(self.heading, Section | SectionAst)
+
+    def title(self) -> str:
+        return html_to_text(self.heading.to_html().split("</h2>", 1)[0])
+
+    def placeholder(self) -> str:
+        heading = self.heading.to_html() if self.is_heading_shown() else ""
+        return (
+            f'<section class="fragment" id="{self.anchor}"'
+            f' data-fragment="{self.index}">{heading}</section>'
+        )
+
+    def to_html(self) -> str:
+        nodes = self.nodes if self.is_heading_shown() else [self.heading] + self.nodes
+        return "".join(node.to_html() for node in nodes)
+
+
+class SplitPaper:
+    """A converted paper cut into a shell page and one fragment per top-level section.
+
+    The shell keeps everything before the first section (title, authors,
+    abstract) plus a table of contents and the section headings, the rest of
+    each section is written to its own file and only loaded when the reader
+    gets there.
+    """
+
+    def __init__(self, root: Root):
+        self.root = root
+        self.document: HtmlNode = next(
+            (node for node in root.descendants() if isinstance(node, Document)), root
+        )
+        self.front: list[HtmlNode] = []
+        self.fragments: list[Fragment] = []
+        for child in self.document.children:
+            if isinstance(child, FRAGMENT_STARTS):
+                self.fragments.append(Fragment(len(self.fragments) + 1, child))
+            elif self.fragments:
+                self.fragments[-1].nodes.append(child)
+            else:
+                self.front.append(child)
+        self._html = {fragment.index: fragment.to_html() for fragment in self.fragments}
+
+    def fragment_html(self, fragment: Fragment) -> str:
+        return self._html[fragment.index]
+
+    def manifest(self) -> dict:
+        """Which fragment holds each id, and previews of the referenced ones.
+
+        Hovering a \\ref or \\cite into a section that is not loaded yet shows
+        the preview from here instead of the element itself.
+        """
+        referenced = set()
+        for node in self.root.descendants():
+            if isinstance(node, Ref):
+                referenced.add(node.args[0].to_html())
+            elif isinstance(node, Cite):
+                referenced.update(node.keys())
+        fragments = {}
+        previews = {}
+        for fragment in self.fragments:
+            text = self._html[fragment.index]
+            for start in ID_ATTRIBUTE.finditer(text):
+                anchor = html.unescape(start.group(2))
+                fragments[anchor] = fragment.index
+                if anchor in referenced and anchor not in previews:
+                    preview = _inner_html(text, start)
+                    if preview is not None:
+                        previews[anchor] = preview.strip()
+        return {"fragments": fragments, "previews": previews}
+
+    def table_of_contents(self) -> str:
+        items = "".join(
+            f'<li><a href="#{fragment.anchor}">{html.escape(fragment.title())}</a></li>'
+            for fragment in self.fragments
+        )
+        return f'<nav class="toc"><h3>Contents</h3><ol>{items}</ol></nav>'
+
+    def shell_body(self) -> str:
+        document = "".join(node.to_html() for node in self.front)
+        document += self.table_of_contents()
+        document += "".join(fragment.placeholder() for fragment in self.fragments)
+        if self.document is self.root:
+            return document
+        return "".join(
+            document if child is self.document else child.to_html()
+            for child in self.root.children
+        )
+
+
+def fragment_js(index: int, fragment_html: str) -> str:
+    # a script instead of html so fragments also load from file:// urls
+    return f"window.paperSplit.loaded({index}, {json.dumps(fragment_html, ensure_ascii=False)});\n"
+
+
+class SplitVisitor(TexVisitor):
+    def __init__(self, fragment_url: str):
+        super().__init__("split")
+        self.fragment_url = fragment_url
+        self.manifest: dict = {"fragments": {}, "previews": {}}
+
+    def split(self, root: Root) -> tuple[str, SplitPaper]:
+        """Returns the shell page of `root` and the split paper holding its fragments."""
+        paper = SplitPaper(root)
+        self.manifest = paper.manifest()
+        return root.page(paper.shell_body()), paper
+
+    @override
+    def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
+
+    @override
+    def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
+
+    @override
+    def visit_token(self, token: Token, context: TexContext) -> VisitResult:
+        return VisitResult.pass_by()
+
+    @override
+    def global_js(self) -> str:
+        manifest = dict(self.manifest, url=self.fragment_url)
+        # </ would end the script element early
+        data = json.dumps(manifest, ensure_ascii=False).replace("</", "<\\/")
+        return f"<script>window.paperSplitManifest = {data};</script>"
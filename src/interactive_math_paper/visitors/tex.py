@@ -1,7 +1,19 @@
-from typing import override
+import html
+import re
+from pathlib import Path
+from typing import override, Optional
 from TexSoup.data import TexCmd, TexEnv, Token
 from TexSoup.tokens import TC
 from ..conversion import HtmlNode, TexVisitor, VisitResult, TexContext, EmptyNode
+from ..bibtex import (
+    BibDatabase,
+    BibEntry,
+    format_entry,
+    sort_entries,
+    entry_labels,
+    parse_bbl,
+)
+from ..labeldb import LabelDatabase, LabelRecord
 
 
 class HtmlBraces(HtmlNode):
@@ -12,7 +24,7 @@ class HtmlBraces(HtmlNode):
     @override
     def to_html(self) -> str:
         if any(isinstance(child, EmBraces) for child in self.children):
-            return f"<i>{self.children_to_html()}</i>"
+            return f"<i{self.id_attribute()}>{self.children_to_html()}</i>"
         return (
             self.children_to_html()
             if not self.visible
@@ -27,6 +39,14 @@ class Label(EmptyNode):
     def __init__(self, label_id: str):
         super().__init__()
         self.label_id = label_id
+        # set by theorems and figures, which put the id on themselves
+        self.on_parent = False
+
+    @override
+    def to_html(self) -> str:
+        if self.on_parent:
+            return self.children_to_html()
+        return f'<span id="{self.label_id}"></span>{self.children_to_html()}'
 
 
 class Tag(EmptyNode):
@@ -35,13 +55,24 @@ class Tag(EmptyNode):
         self.tag = tag
 
 
+def external_link(record: LabelRecord, text: str) -> str:
+    preview = ""
+    if record.preview:
+        preview = f' data-preview="{html.escape(record.preview)}"'
+    return f'<a href="{html.escape(record.href)}"{preview}>{text}</a>'
+
+
 class Ref(HtmlNode):
-    def __init__(self, ref_resolution):
+    def __init__(self, ref_resolution, external_resolution=lambda key: None):
         super().__init__()
         self.ref_resolution = ref_resolution
+        self.external_resolution = external_resolution
 
     @override
     def to_html(self) -> str:
+        record = self.external_resolution(self.args[0].to_html())
+        if record is not None:
+            return external_link(record, record.tag)
         return (
             '<a href="#'
             + f'{self.args[0].to_html()}">{self.ref_resolution(self.args[0].to_html())}</a>'
@@ -54,6 +85,9 @@ class Root(HtmlNode):
 
     @override
     def to_html(self) -> str:
+        return self.page(self.children_to_html())
+
+    def page(self, body: str) -> str:
         global_js = ""
         global_css = ""
         for visitor in TexVisitor.visitors:
@@ -76,7 +110,7 @@ class Root(HtmlNode):
         </style>
             </head>
             <body>
-                {self.children_to_html()}
+                {body}
             </body>
         </html>
         """
@@ -126,11 +160,110 @@ class Bibitem(HtmlNode):
 
 
 class Cite(HtmlNode):
+    def __init__(self, cite_resolution, note_resolution=lambda key, note: None):
+        super().__init__()
+        self.cite_resolution = cite_resolution
+        self.note_resolution = note_resolution
+
+    def keys(self) -> list[str]:
+        return [key.strip() for key in self.args[-1].to_html().split(",")]
+
     @override
     def to_html(self) -> str:
-        return (
-            '<a href="#' + f'{self.args[0].to_html()}">[{self.args[0].to_html()}]</a>'
-        )
+        keys = self.keys()
+        if len(keys) == 1 and len(self.args) == 1:
+            return f'<a href="#{keys[0]}">[{self.cite_resolution(keys[0])}]</a>'
+        links = [f'<a href="#{key}">{self.cite_resolution(key)}</a>' for key in keys]
+        note = ""
+        if len(self.args) > 1:
+            note = self.args[0].to_html()
+            # \cite[Theorem 2.1]{paper} links to that theorem of a converted paper
+            record = self.note_resolution(keys[0], note) if len(keys) == 1 else None
+            note = ", " + (note if record is None else external_link(record, note))
+        return f"[{', '.join(links)}{note}]"
+
+
+class BibliographyStyle(EmptyNode):
+    def __init__(self, style: str):
+        super().__init__()
+        self.style = style
+
+
+class BibtexBibliography(HtmlNode):
+    def __init__(self, databases: list[BibDatabase]):
+        super().__init__()
+        self.databases = databases
+        self._cited: Optional[list[BibEntry]] = None
+        self._labels: dict[str, str] = {}
+        self._style: Optional[str] = None
+
+    def _root(self) -> HtmlNode:
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def _resolve(self):
+        if self._cited is not None:
+            return
+        cited = {}
+        for node in self._root().descendants():
+            if isinstance(node, BibliographyStyle):
+                self._style = node.style
+            if not isinstance(node, Cite):
+                continue
+            for key in node.keys():
+                if key.lower() in cited:
+                    continue
+                for database in self.databases:
+                    entry = database.get(key)
+                    if entry is not None:
+                        cited[key.lower()] = entry
+                        break
+        self._cited = sort_entries(list(cited.values()), self._style)
+        self._labels = entry_labels(self._cited, self._style)
+
+    def label(self, key: str) -> Optional[str]:
+        self._resolve()
+        return self._labels.get(key.lower())
+
+    @override
+    def to_html(self) -> str:
+        self._resolve()
+        assert self._cited is not None
+        heading = "<h2>Bibliography</h2>"
+        for entry in self._cited:
+            heading += f"""<div class="references">
+                <div class="reference-item">
+                    <span class="ref-label">[{self._labels[entry.key.lower()]}]</span>
+                    <div class="ref-content" id="{entry.key}">{format_entry(entry, self._style)}</div>
+                </div>
+            </div>"""
+        return heading
+
+
+class BblBibliography(HtmlNode):
+    """The bibliography of a paper that ships its compiled `.bbl` but no `.bib`."""
+
+    def __init__(self, items: list[tuple[str, str, str]]):
+        super().__init__()
+        self.items = items
+        self._labels = {key.lower(): label for label, key, _ in items}
+
+    def label(self, key: str) -> Optional[str]:
+        return self._labels.get(key.lower())
+
+    @override
+    def to_html(self) -> str:
+        heading = "<h2>Bibliography</h2>"
+        for label, key, content in self.items:
+            heading += f"""<div class="references">
+                <div class="reference-item">
+                    <span class="ref-label">[{label}]</span>
+                    <div class="ref-content" id="{key}">{content}</div>
+                </div>
+            </div>"""
+        return heading
 
 
 class Abstract(HtmlNode):
@@ -204,7 +337,7 @@ class Proof(HtmlNode):
     @override
     def to_html(self) -> str:
         return (
-            """<details><summary>Proof</summary>"""
+            f"""<details{self.id_attribute()}><summary>Proof</summary>"""
             f"""<div class="proof-content">{self.children_to_html()} □</div></details>"""
         )
 
@@ -217,21 +350,64 @@ class Section(Tag):
     @override
     def to_html(self) -> str:
         number_text = f" {self.number} "
-        return f"<h2>{number_text}{self.args[0].to_html()}</h2>"
+        return f"<h2{self.id_attribute()}>{number_text}{self.args[0].to_html()}</h2>"
 
 
 class SectionAst(HtmlNode):
     @override
     def to_html(self) -> str:
-        return f"<h2>{self.args[0].to_html()}</h2>"
+        return f"<h2{self.id_attribute()}>{self.args[0].to_html()}</h2>"
 
 
 class DefaultTexVisitor(TexVisitor):
-    def __init__(self):
+    def __init__(
+        self,
+        base_path: Path = Path("."),
+        label_database: Optional[LabelDatabase] = None,
+    ):
         super().__init__("tex")
+        self.base_path = base_path
+        self.label_database = label_database
+        # (prefix, paper) pairs from \externaldocument[prefix]{paper}
+        self.external_documents: list[tuple[str, str]] = []
+        # problems that did not stop the conversion, e.g. a malformed bib entry
+        self.warnings: list[str] = []
+        self.bibliography: Optional[BibtexBibliography | BblBibliography] = None
 
     labels = {}
 
+    def find_bbl(self, names: list[str]) -> Optional[Path]:
+        """The compiled bibliography shipped instead of the `.bib` files, as on arXiv."""
+        for name in names:
+            candidate = self.base_path / f"{name.removesuffix('.bib')}.bbl"
+            if candidate.is_file():
+                return candidate
+        candidates = list(self.base_path.glob("*.bbl"))
+        return candidates[0] if len(candidates) == 1 else None
+
+    def resolve_external_ref(self, key: str) -> Optional[LabelRecord]:
+        if self.label_database is None or key in DefaultTexVisitor.labels:
+            return None
+        for prefix, paper in self.external_documents:
+            if key.startswith(prefix):
+                record = self.label_database.lookup(paper, key[len(prefix) :])
+                if record is not None:
+                    return record
+        return None
+
+    def resolve_cite_note(self, key: str, note: str) -> Optional[LabelRecord]:
+        if self.label_database is None:
+            return None
+        match = re.fullmatch(r"\s*([A-Za-z]+)\s+([\w.]+)\s*", note)
+        if match is None:
+            return None
+        return self.label_database.lookup_tag(key, match.group(1), match.group(2))
+
+    def resolve_cite(self, key: str) -> str:
+        if self.bibliography is None:
+            return key
+        return self.bibliography.label(key) or key
+
     @override
     def visit_env(self, env: TexEnv, context: TexContext) -> VisitResult:
         if env.name == "[tex]":
@@ -257,9 +433,7 @@ class DefaultTexVisitor(TexVisitor):
     @override
     def visit_cmd(self, cmd: TexCmd, context: TexContext) -> VisitResult:
         if cmd.name == "section":
-            section_number = (context.first(Section) or Section(0)).number + 1
-            section = Section(section_number)
-            return VisitResult.use(section)
+            return VisitResult.use(Section(context.counters.step("section")))
         if cmd.name == "section*":
             return VisitResult.use(SectionAst())
         if cmd.name == "item":
@@ -283,17 +457,79 @@ class DefaultTexVisitor(TexVisitor):
                 )
             )
         if cmd.name == "cite":
-            return VisitResult.use(Cite())
+            return VisitResult.use(Cite(self.resolve_cite, self.resolve_cite_note))
+        if cmd.name == "bibliographystyle":
+            return VisitResult.use(
+                BibliographyStyle(cmd.args[0].contents[0].strip()), False
+            )
+        if cmd.name == "bibliography":
+            names = [name.strip() for name in cmd.args[0].contents[0].split(",")]
+            paths = [
+                self.base_path / (name if name.endswith(".bib") else f"{name}.bib")
+                for name in names
+            ]
+            missing = [path for path in paths if not path.is_file()]
+            if missing:
+                bbl = self.find_bbl(names)
+                if bbl is not None:
+                    with open(bbl, "r", encoding="utf-8") as f:
+                        self.bibliography = BblBibliography(parse_bbl(f.read()))
+                    return VisitResult.use(self.bibliography, False)
+                self.warnings.extend(
+                    f"bibliography {path.name} not found" for path in missing
+                )
+            databases = [
+                BibDatabase.load(path) for path in paths if path not in missing
+            ]
+            for database in databases:
+                self.warnings.extend(
+                    f"{database.path.name} {error}" for error in database.errors
+                )
+            self.bibliography = BibtexBibliography(databases)
+            return VisitResult.use(self.bibliography, False)
         if cmd.name == "bibitem":
             return VisitResult.use(Bibitem())
         if cmd.name == "ref":
             return VisitResult.use(
-                Ref(lambda key: DefaultTexVisitor.labels.get(key, "??"))
+                Ref(
+                    lambda key: DefaultTexVisitor.labels.get(key, "??"),
+                    self.resolve_external_ref,
+                )
             )
+        if cmd.name == "externaldocument":
+            prefix = cmd.args[0].contents[0] if len(cmd.args) > 1 else ""
+            paper = Path(str(cmd.args[-1].contents[0]).strip()).stem
+            self.external_documents.append((prefix, paper))
+            return VisitResult.hidden(False)
         if cmd.name == "label":
             label_id = cmd.args[0].contents[0]
             DefaultTexVisitor.labels[label_id] = (context.first(Tag) or Tag("??")).tag
             return VisitResult.use(Label(label_id))
+        if cmd.name == "newcounter":
+            within = cmd.args[1].contents[0] if len(cmd.args) > 1 else None
+            context.counters.new(cmd.args[0].contents[0], within)
+            return VisitResult.hidden(False)
+        if cmd.name in ("setcounter", "addtocounter"):
+            name = cmd.args[0].contents[0]
+            value = int(str(cmd.args[1].contents[0]).strip())
+            if cmd.name == "setcounter":
+                context.counters.set(name, value)
+            else:
+                context.counters.add(name, value)
+            return VisitResult.hidden(False)
+        if cmd.name == "stepcounter":
+            context.counters.step(cmd.args[0].contents[0])
+            return VisitResult.hidden(False)
+        if cmd.name == "refstepcounter":
+            name = cmd.args[0].contents[0]
+            context.counters.step(name)
+            return VisitResult.use(Tag(context.counters.format(name)), False)
+        if cmd.name == "arabic":
+            return VisitResult.use(
+                TextNode(str(context.counters.value(cmd.args[0].contents[0]))), False
+            )
+        if cmd.name.startswith("the") and cmd.name[3:] in context.counters:
+            return VisitResult.use(TextNode(context.counters.format(cmd.name[3:])))
         if cmd.name == "em":
             return VisitResult.use(EmBraces())
         if cmd.name == "documentclass":
@@ -0,0 +1,34 @@
+import html
+from ..conversion import HtmlNode
+from ..labeldb import LabelRecord
+from .tex import DefaultTexVisitor, Label
+from .amsthm import TheoremEnv
+
+
+def collect_label_records(root: HtmlNode, url: str) -> list[LabelRecord]:
+    """Gathers the labels of a paper written to `url` for the label database.
+
+    Theorem-like environments also store their kind ("Theorem", "Lemma", ...)
+    and their html as preview, so other papers can show them on hover.
+    """
+    theorems = {}
+    rendered = set()
+    for node in root.descendants():
+        if isinstance(node, TheoremEnv) and node._get_label() is not None:
+            theorems[node._get_label()] = node
+        elif isinstance(node, Label):
+            rendered.add(node.label_id)
+    # links inside a preview are shown on another page, point them back here
+    local_link = f'href="{html.escape(url)}#'
+    records = []
+    for label, tag in DefaultTexVisitor.labels.items():
+        theorem = theorems.get(label)
+        if theorem is not None:
+            preview = theorem.to_html().replace('href="#', local_link)
+            records.append(LabelRecord(label, tag, label, theorem.label, preview))
+        elif label in rendered:
+            records.append(LabelRecord(label, tag, label))
+        else:
+            # equation labels are passed to MathJax, which renders this id
+            records.append(LabelRecord(label, tag, f"mjx-eqn:{label}"))
+    return records